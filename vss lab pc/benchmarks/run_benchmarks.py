@@ -0,0 +1,184 @@
+"""Load-test the product, auth and order services running locally.
+
+Starts all three v2 services against fresh local databases (SQLite files by
+default) and a fake Redis, seeds fixture data, drives a weighted mix of user
+journeys from concurrent virtual users and reports p50/p95/p99 latency and RPS
+per endpoint. Results are written as JSON; pass an earlier result file as
+--baseline to flag regressions.
+
+    python benchmarks/run_benchmarks.py --concurrency 16 --duration 60
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from scenarios import DEFAULT_MIX, SCENARIOS, Client, Recorder, login_user, parse_mix
+from seed import seed_stack
+from stack import LocalStack
+
+DEFAULT_OUTPUT = Path(__file__).resolve().parent / 'results' / 'latest.json'
+
+
+def run_load(ctx, urls, mix, concurrency, duration, warmup, seed):
+    """Run virtual users for warmup + duration seconds; returns (endpoints, total, elapsed)"""
+    recorder = Recorder()
+    recorder.enabled = False
+    stop = threading.Event()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    def virtual_user(index):
+        rng = random.Random(seed * 1000 + index)
+        client = Client(urls, recorder)
+        while not stop.is_set():
+            SCENARIOS[rng.choices(names, weights)[0]](ctx, client, rng)
+
+    workers = [threading.Thread(target=virtual_user, args=(index,), daemon=True) for index in range(concurrency)]
+    for worker in workers:
+        worker.start()
+
+    time.sleep(warmup)
+    recorder.reset()
+    recorder.enabled = True
+    started = time.perf_counter()
+    time.sleep(duration)
+    stop.set()
+    elapsed = time.perf_counter() - started
+    recorder.enabled = False
+    for worker in workers:
+        worker.join(timeout=60)
+
+    endpoints, total = recorder.summary(elapsed)
+    return endpoints, total, elapsed
+
+
+def compare_to_baseline(result, baseline, tolerance):
+    """Endpoints whose p95 grew, RPS dropped or error rate rose beyond the tolerance"""
+    regressions = []
+    current = dict(result['endpoints'], TOTAL=result['total'])
+    previous = dict(baseline.get('endpoints', {}), TOTAL=baseline.get('total', {}))
+    for label, stats in current.items():
+        before = previous.get(label)
+        if not before:
+            continue
+        if before['p95_ms'] and stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{label}: p95 {before["p95_ms"]}ms -> {stats["p95_ms"]}ms')
+        if before['rps'] and stats['rps'] < before['rps'] * (1 - tolerance):
+            regressions.append(f'{label}: RPS {before["rps"]} -> {stats["rps"]}')
+        if stats['error_rate'] > before['error_rate'] + 0.01:
+            regressions.append(f'{label}: error rate {before["error_rate"]} -> {stats["error_rate"]}')
+    return regressions
+
+
+def print_report(endpoints, total):
+    header = f'{"endpoint":<34}{"reqs":>8}{"rps":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"errors":>8}'
+    print(header)
+    print('-' * len(header))
+    for label, stats in list(endpoints.items()) + [('TOTAL', total)]:
+        print(f'{label:<34}{stats["requests"]:>8}{stats["rps"]:>9}{stats["p50_ms"]:>9}'
+              f'{stats["p95_ms"]:>9}{stats["p99_ms"]:>9}{stats["errors"]:>8}')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds before measuring')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Scenario weights, e.g. browse=60,login=10,checkout=20,admin=10')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for fixtures and scenario choices')
+    parser.add_argument('--products', type=int, default=200, help='Generated products')
+    parser.add_argument('--customers', type=int, default=200, help='Generated customers')
+    parser.add_argument('--orders', type=int, default=2000, help='Generated orders')
+    parser.add_argument('--login-users', type=int, default=50, help='Customers used as virtual users')
+    parser.add_argument('--product-db', help='Database URL for the product service (default: SQLite file)')
+    parser.add_argument('--auth-db', help='Database URL for the auth service (default: SQLite file)')
+    parser.add_argument('--order-db', help='Database URL for the order service (default: SQLite file)')
+    parser.add_argument('--no-fake-redis', action='store_true', help='Run the services without Redis')
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='werkzeug',
+                        help='Serve with the threaded development server or with Gunicorn (WEB_* env tunes it)')
+    parser.add_argument('--workdir', help='Directory for SQLite files and service logs (default: a temp dir)')
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help='Where to write the JSON results')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative p95/RPS change before a regression is reported')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix='vss-bench-')
+    stack = LocalStack(workdir, {'product': args.product_db, 'auth': args.auth_db, 'order': args.order_db},
+                       fake_redis=not args.no_fake_redis, server=args.server)
+
+    print(f'Seeding fixtures and starting services in {workdir}')
+    stack.start_redis()
+    ctx = seed_stack(stack, args.products, args.customers, args.orders, args.seed, args.login_users)
+    try:
+        stack.start()
+
+        # Tokens are fetched once up front; the login scenario measures logins separately
+        setup_client = Client(stack.urls, Recorder())
+        setup_client.recorder.enabled = False
+        for user in [ctx['admin']] + ctx['customers']:
+            user['token'] = login_user(setup_client, user)
+            if not user['token']:
+                raise RuntimeError(f'Could not log in fixture user {user["username"]}')
+
+        print(f'Running {args.concurrency} virtual users for {args.duration}s (+{args.warmup}s warm-up)')
+        endpoints, total, elapsed = run_load(ctx, stack.urls, args.mix, args.concurrency,
+                                             args.duration, args.warmup, args.seed)
+    finally:
+        stack.stop()
+
+    result = {
+        'created_at': datetime.utcnow().isoformat(),
+        'config': {
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'mix': args.mix,
+            'seed': args.seed,
+            'products': args.products,
+            'customers': args.customers,
+            'orders': args.orders,
+            'login_users': args.login_users,
+        },
+        'environment': dict(stack.describe(), python=platform.python_version(),
+                            platform=platform.platform(), cpu_count=os.cpu_count()),
+        'elapsed_seconds': round(elapsed, 3),
+        'total': total,
+        'endpoints': endpoints,
+    }
+
+    print_report(endpoints, total)
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f'Results written to {output}')
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if baseline.get('config') != result['config']:
+            print('Warning: baseline was recorded with a different configuration')
+        regressions = compare_to_baseline(result, baseline, args.tolerance)
+        if regressions:
+            print(f'Regressions against {args.baseline}:')
+            for regression in regressions:
+                print(f'  {regression}')
+            return 1
+        print(f'No regressions against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
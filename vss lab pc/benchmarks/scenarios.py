@@ -0,0 +1,162 @@
+"""User journeys the load generator mixes, and the recorder that times every request."""
+import threading
+import time
+
+import requests
+
+DEFAULT_MIX = {'browse': 60, 'login': 10, 'checkout': 20, 'admin': 10}
+
+
+class Recorder:
+    """Thread-safe per-endpoint latency samples and status counts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self.enabled = True
+
+    def record(self, label, latency, status):
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._samples.setdefault(label, {'latencies': [], 'statuses': {}})
+            entry['latencies'].append(latency)
+            entry['statuses'][status] = entry['statuses'].get(status, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self, elapsed):
+        """p50/p95/p99/mean/max latency (ms), request count, RPS and errors per endpoint"""
+        with self._lock:
+            samples = {label: (list(entry['latencies']), dict(entry['statuses']))
+                       for label, entry in self._samples.items()}
+        endpoints = {label: summarize(latencies, statuses, elapsed)
+                     for label, (latencies, statuses) in sorted(samples.items())}
+        all_latencies, all_statuses = [], {}
+        for latencies, statuses in samples.values():
+            all_latencies += latencies
+            for status, count in statuses.items():
+                all_statuses[status] = all_statuses.get(status, 0) + count
+        return endpoints, summarize(all_latencies, all_statuses, elapsed)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, statuses, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    # Transport failures are recorded with status 'error'
+    errors = sum(n for status, n in statuses.items() if status == 'error' or int(status) >= 500)
+    return {
+        'requests': count,
+        'rps': round(count / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(sum(latencies) / count * 1000, 2) if count else 0.0,
+        'max_ms': round(latencies[-1] * 1000, 2) if count else 0.0,
+        'errors': errors,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'statuses': {str(status): n for status, n in sorted(statuses.items(), key=lambda item: str(item[0]))},
+    }
+
+
+class Client:
+    """One virtual user's HTTP session; every request is timed under an endpoint label"""
+
+    def __init__(self, urls, recorder, timeout=30):
+        self.urls = urls
+        self.recorder = recorder
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def call(self, label, method, service, path, token=None, **kwargs):
+        """Send a request and return the response, or None if it failed in transport"""
+        headers = kwargs.pop('headers', {})
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f'{self.urls[service]}{path}', headers=headers,
+                                            timeout=self.timeout, **kwargs)
+        except requests.RequestException:
+            self.recorder.record(label, time.perf_counter() - started, 'error')
+            return None
+        self.recorder.record(label, time.perf_counter() - started, response.status_code)
+        return response
+
+
+def login_user(client, user):
+    """Log a user in and return the access token (None on failure)"""
+    response = client.call('POST /login', 'POST', 'auth', '/login',
+                           json={'username': user['username'], 'password': user['password']})
+    if response is None or response.status_code != 200:
+        return None
+    return response.json()['token']
+
+
+def browse(ctx, client, rng):
+    """Category listing, then a few product detail pages"""
+    client.call('GET /products?category=', 'GET', 'product', '/products',
+                params={'category': rng.choice(ctx['categories'])})
+    for product_id in rng.sample(ctx['product_ids'], min(3, len(ctx['product_ids']))):
+        client.call('GET /products/<id>', 'GET', 'product', f'/products/{product_id}')
+
+
+def login(ctx, client, rng):
+    """Sign in, then open "My orders" and the order summary"""
+    user = rng.choice(ctx['customers'])
+    token = login_user(client, user)
+    if token:
+        client.call('GET /orders/user/<id>', 'GET', 'order', f'/orders/user/{user["id"]}', token=token)
+        client.call('GET /orders/user/<id>/summary', 'GET', 'order', f'/orders/user/{user["id"]}/summary', token=token)
+
+
+def checkout(ctx, client, rng):
+    """Look at the cart's products, quote the cart and place the order"""
+    user = rng.choice(ctx['customers'])
+    product_ids = rng.sample(ctx['product_ids'], rng.randint(1, min(4, len(ctx['product_ids']))))
+    items = [{'product_id': product_id, 'quantity': rng.randint(1, 3)} for product_id in product_ids]
+    client.call('GET /products/batch', 'GET', 'product', '/products/batch',
+                params={'ids': ','.join(str(product_id) for product_id in product_ids)})
+    response = client.call('POST /orders/quote', 'POST', 'order', '/orders/quote', token=user['token'],
+                           json={'items': items})
+    body = {'items': items, 'shipping_address': '1 Benchmark Way'}
+    if response is not None and response.status_code == 200:
+        body['quote_token'] = response.json().get('quote_token')
+    client.call('POST /orders', 'POST', 'order', '/orders', token=user['token'], json=body)
+
+
+def admin(ctx, client, rng):
+    """Admin order listing, one order's detail and the revenue report"""
+    token = ctx['admin']['token']
+    response = client.call('GET /orders', 'GET', 'order', '/orders', token=token, params={'limit': 50})
+    if response is not None and response.status_code == 200 and response.json():
+        order_id = rng.choice(response.json())['id']
+        client.call('GET /orders/<id>', 'GET', 'order', f'/orders/{order_id}', token=token)
+    client.call('GET /analytics/revenue', 'GET', 'order', '/analytics/revenue', token=token)
+
+
+SCENARIOS = {'browse': browse, 'login': login, 'checkout': checkout, 'admin': admin}
+
+
+def parse_mix(text):
+    """'browse=60,checkout=20' -> {'browse': 60, 'checkout': 20}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f'Unknown scenario {name!r}; choose from {", ".join(SCENARIOS)}')
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError('At least one scenario needs a positive weight')
+    return mix
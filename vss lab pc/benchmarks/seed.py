@@ -0,0 +1,29 @@
+"""Benchmark fixtures: a synthetic dataset sized for a load-test run."""
+import random
+
+from datagen import generate_all, username
+
+
+def seed_stack(stack, products=200, customers=50, orders=500, seed=42, login_users=50):
+    """Fill the stack's databases before its services start; returns the scenario context
+
+    Stock is plentiful and every customer is active so checkouts and logins
+    measure the services rather than failing on fixture data. Only a sample of
+    `login_users` customers is used as virtual users.
+    """
+    dataset = generate_all(
+        {service: stack.service_env(service) for service in ('product', 'auth', 'order')},
+        products, customers + 1, orders, seed=seed,
+        product_options={'stock_range': (100000, 1000000), 'out_of_stock_rate': 0.0},
+        user_options={'inactive_rate': 0.0}
+    )
+    customer_ids = dataset['customer_ids']
+    sample = random.Random(seed).sample(customer_ids, min(login_users, len(customer_ids)))
+    admin_id = dataset['admin_ids'][0]
+    return {
+        'product_ids': dataset['catalogue'].product_ids,
+        'categories': dataset['catalogue'].categories,
+        'admin': {'id': admin_id, 'username': username(admin_id, admin=True), 'password': dataset['password']},
+        'customers': [{'id': user_id, 'username': username(user_id), 'password': dataset['password']}
+                      for user_id in sample],
+    }
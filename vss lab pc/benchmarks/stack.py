@@ -0,0 +1,240 @@
+"""Run the three v2 services locally for benchmarking.
+
+Each service runs in its own process on a free localhost port, backed by a
+SQLite file (or any database URL you pass, e.g. a local Postgres) and an
+in-process fake Redis speaking the real protocol, so the services talk to
+each other exactly as they do under docker-compose.
+
+    python benchmarks/stack.py serve <product|auth|order> <port>
+
+is the per-service entry point used by LocalStack; it is not meant to be
+run by hand. With server='gunicorn' the services run under Gunicorn with the
+production settings from shared/gunicorn_conf.py instead, tuned by the same
+WEB_* environment variables as the images.
+"""
+import importlib.util
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SERVICE_DIRS = {
+    'product': ROOT / 'product-catalogue-service',
+    'auth': ROOT / 'user-authentication-service',
+    'order': ROOT / 'order-processing-service',
+}
+# Modules every service imports (copied next to app.py in the images)
+SHARED_DIR = ROOT / 'shared'
+
+BENCH_JWT_SECRET = 'benchmark-jwt-secret'
+
+# Tunables a benchmark run changes unless they are already set in the environment.
+# Rate limits are lifted so the load generator measures the services, not the limiter.
+BENCH_DEFAULTS = {
+    'auth': {
+        'RATE_LIMIT_IP_PER_MINUTE': '1000000',
+        'RATE_LIMIT_IP_BURST': '1000000',
+        'RATE_LIMIT_USER_PER_MINUTE': '1000000',
+        'RATE_LIMIT_USER_BURST': '1000000',
+    },
+    'order': {
+        'ASYNC_FULFILMENT': 'false',
+        'FULFILMENT_QUEUE': 'database',
+    },
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def sqlite_url(path):
+    # A generous busy timeout: SQLite serialises writers across threads
+    return f'sqlite:///{path}?timeout=30'
+
+
+def load_service(service, env):
+    """Import a service's app_v2 module under a unique name with `env` applied
+
+    The modules read their configuration at import time, so the environment is
+    patched only for the duration of the import.
+    """
+    service_dir = SERVICE_DIRS[service]
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        for path in (SHARED_DIR, service_dir):
+            if str(path) not in sys.path:
+                sys.path.insert(0, str(path))
+        spec = importlib.util.spec_from_file_location(f'bench_{service}_app', service_dir / 'app_v2.py')
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def start_fake_redis():
+    """Start fakeredis' TCP server on a free port; returns (server, url) or (None, None)"""
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        return None, None
+    TcpFakeServer.daemon_threads = True
+    server = TcpFakeServer(('127.0.0.1', 0), server_type='redis')
+    threading.Thread(target=server.serve_forever, name='fake-redis', daemon=True).start()
+    return server, f'redis://127.0.0.1:{server.server_address[1]}'
+
+
+class LocalStack:
+    """Product, auth and order services plus a fake Redis on localhost"""
+
+    def __init__(self, workdir, database_urls=None, fake_redis=True, startup_timeout=30, server='werkzeug'):
+        self.workdir = Path(workdir)
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        database_urls = database_urls or {}
+        self.database_urls = {
+            service: database_urls.get(service) or sqlite_url(self.workdir / f'{service}.db')
+            for service in SERVICE_DIRS
+        }
+        self.use_fake_redis = fake_redis
+        self.server = server
+        self.startup_timeout = startup_timeout
+        self.ports = {service: free_port() for service in SERVICE_DIRS}
+        self.urls = {service: f'http://127.0.0.1:{port}' for service, port in self.ports.items()}
+        self.redis_server = None
+        self.redis_url = None
+        self._processes = {}
+        self._logs = []
+
+    def service_env(self, service):
+        """Environment for one service process (also used to import it for seeding)"""
+        env = {'DATABASE_URL': self.database_urls[service]}
+        if self.server == 'gunicorn':
+            env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(SHARED_DIR), os.environ.get('PYTHONPATH')]))
+        if service == 'auth':
+            env['JWT_SECRET'] = BENCH_JWT_SECRET
+            if self.redis_url:
+                env['RATE_LIMIT_REDIS_URL'] = self.redis_url
+        elif service == 'product':
+            if self.redis_url:
+                env['REDIS_URL'] = self.redis_url
+                env['PRODUCT_EVENTS_REDIS_URL'] = self.redis_url
+        elif service == 'order':
+            env['PRODUCT_SERVICE_URL'] = self.urls['product']
+            env['AUTH_SERVICE_URL'] = self.urls['auth']
+            if self.redis_url:
+                env['PRODUCT_EVENTS_REDIS_URL'] = self.redis_url
+                env['ORDER_SUMMARY_REDIS_URL'] = f'{self.redis_url}/1'
+        for key, value in BENCH_DEFAULTS.get(service, {}).items():
+            env[key] = os.environ.get(key, value)
+        return env
+
+    def start_redis(self):
+        if self.use_fake_redis and self.redis_server is None:
+            self.redis_server, self.redis_url = start_fake_redis()
+            if self.redis_server is None:
+                print('fakeredis is not installed; services fall back to their in-process stores')
+
+    def start(self):
+        """Start fake Redis (if requested) and the three services, then wait until healthy"""
+        self.start_redis()
+        for service in ('product', 'auth', 'order'):
+            env = dict(os.environ)
+            env.update(self.service_env(service))
+            log = open(self.workdir / f'{service}.log', 'ab')
+            self._logs.append(log)
+            self._processes[service] = subprocess.Popen(
+                self.server_command(service), cwd=str(SERVICE_DIRS[service]), env=env,
+                stdout=log, stderr=subprocess.STDOUT
+            )
+        for service in self._processes:
+            self.wait_healthy(service)
+
+    def server_command(self, service):
+        if self.server == 'gunicorn':
+            return [sys.executable, '-m', 'gunicorn', '-c', str(SHARED_DIR / 'gunicorn_conf.py'),
+                    '--bind', f'127.0.0.1:{self.ports[service]}', 'app_v2:app']
+        return [sys.executable, str(Path(__file__).resolve()), 'serve', service, str(self.ports[service])]
+
+    def wait_healthy(self, service):
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self._processes[service].poll() is not None:
+                raise RuntimeError(f'{service} service exited; see {self.workdir / (service + ".log")}')
+            try:
+                if requests.get(f'{self.urls[service]}/health', timeout=1).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f'{service} service did not become healthy within {self.startup_timeout}s')
+
+    def stop(self):
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self._processes.clear()
+        for log in self._logs:
+            log.close()
+        self._logs.clear()
+        if self.redis_server is not None:
+            self.redis_server.shutdown()
+            self.redis_server.server_close()
+            self.redis_server = None
+
+    def describe(self):
+        return {
+            'databases': {service: url.split(':', 1)[0] for service, url in self.database_urls.items()},
+            'redis': 'fakeredis' if self.redis_url else 'in-process',
+            'server': self.server,
+            'server_settings': {key: value for key, value in sorted(os.environ.items()) if key.startswith('WEB_')},
+        }
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def serve(service, port):
+    """Run one service with a threaded, non-debug server"""
+    from werkzeug.serving import run_simple
+
+    # Per-request access logging would dominate the measured latency
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    module = load_service(service, {})
+    with module.app.app_context():
+        module.db.create_all()
+        module.warm_pool(module.db.engine)
+    # Fulfilment workers and cache invalidation, as gunicorn_conf.post_worker_init starts them
+    start_background_tasks = getattr(module, 'start_background_tasks', None)
+    if start_background_tasks is not None:
+        start_background_tasks()
+    run_simple('127.0.0.1', port, module.app, threaded=True, use_reloader=False, use_debugger=False)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'serve' or sys.argv[2] not in SERVICE_DIRS:
+        sys.exit(f'usage: {sys.argv[0]} serve <{"|".join(SERVICE_DIRS)}> <port>')
+    serve(sys.argv[2], int(sys.argv[3]))
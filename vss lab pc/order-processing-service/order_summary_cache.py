@@ -0,0 +1,118 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class OrderSummaryCache:
+    """Per-user order summaries kept in process memory or, when given a client, in Redis
+
+    Entries are replaced by the write paths after every committed change, so
+    readers normally never miss; the TTL only bounds how long a summary can
+    survive a write that bypassed the cache. Redis should be used whenever
+    more than one process serves requests, otherwise each process would keep
+    its own (possibly stale) copy.
+    """
+
+    def __init__(self, max_entries=10000, ttl=300, redis_client=None, key_prefix='order-summary:'):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    @property
+    def backend(self):
+        return 'redis' if self.redis is not None else 'memory'
+
+    def get(self, user_id):
+        """Return the cached summary for a user, or None"""
+        summary = None
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(f'{self.key_prefix}{user_id}')
+                summary = json.loads(raw) if raw else None
+            except Exception as e:
+                # A cache outage only costs a database read
+                self._record_error('read', e)
+        else:
+            now = time.monotonic()
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry and entry[0] > now:
+                    self._entries.move_to_end(user_id)
+                    summary = entry[1]
+                elif entry:
+                    del self._entries[user_id]
+
+        with self._lock:
+            if summary is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return summary
+
+    def put(self, user_id, summary):
+        if self.redis is not None:
+            try:
+                self.redis.set(f'{self.key_prefix}{user_id}', json.dumps(summary), ex=max(1, int(self.ttl)))
+            except Exception as e:
+                self._record_error('write', e)
+                return
+        else:
+            with self._lock:
+                self._entries[user_id] = (time.monotonic() + self.ttl, summary)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        with self._lock:
+            self.writes += 1
+
+    def invalidate(self, *user_ids):
+        """Drop the given users' summaries"""
+        if not user_ids:
+            return
+        if self.redis is not None:
+            try:
+                self.redis.delete(*[f'{self.key_prefix}{user_id}' for user_id in user_ids])
+            except Exception as e:
+                self._record_error('invalidation', e)
+                return
+        else:
+            with self._lock:
+                for user_id in user_ids:
+                    self._entries.pop(user_id, None)
+        with self._lock:
+            self.invalidations += len(user_ids)
+
+    def _record_error(self, operation, error):
+        logger.error(f"Order summary cache {operation} failed: {str(error)}")
+        with self._lock:
+            self.errors += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'backend': self.backend,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'writes': self.writes,
+                'invalidations': self.invalidations,
+                'errors': self.errors
+            }
+            if self.redis is None:
+                stats['entries'] = len(self._entries)
+                stats['max_entries'] = self.max_entries
+            return stats
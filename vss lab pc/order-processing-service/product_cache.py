@@ -0,0 +1,102 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Only catalogue data that may safely be a few seconds old; stock is never cached
+SNAPSHOT_FIELDS = ('id', 'name', 'price', 'discounted_price', 'discount_percentage', 'category')
+# Events that cannot change a snapshot (stock is not part of one)
+IGNORED_EVENTS = frozenset(['product.stock_changed'])
+
+
+class ProductSnapshotCache:
+    """Bounded LRU cache of product names and prices with a short TTL"""
+
+    def __init__(self, max_entries=10000, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_many(self, product_ids):
+        """Return ({product_id: snapshot} for fresh entries, [missing product_ids])"""
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for product_id in product_ids:
+                entry = self._entries.get(product_id)
+                if entry and entry[0] > now:
+                    self._entries.move_to_end(product_id)
+                    found[product_id] = entry[1]
+                else:
+                    if entry:
+                        del self._entries[product_id]
+                    missing.append(product_id)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put(self, product):
+        """Store the snapshot fields of a full product payload"""
+        snapshot = {field: product.get(field) for field in SNAPSHOT_FIELDS}
+        with self._lock:
+            self._entries[product['id']] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(product['id'])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, product_id=None):
+        """Drop one product, or everything when product_id is None"""
+        with self._lock:
+            if product_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(product_id, None)
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
+
+
+def start_invalidation_listener(redis_client, channel, cache):
+    """Evict cached products on the product service's change events (daemon thread)"""
+
+    def listen():
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(channel)
+                for message in pubsub.listen():
+                    try:
+                        event = json.loads(message['data'])
+                        if event.get('event') in IGNORED_EVENTS:
+                            continue
+                        cache.invalidate(int(event['product_id']))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+            except Exception as e:
+                # Entries we may have missed events for expire via the TTL anyway
+                logger.error(f"Product event listener error: {str(e)}")
+                cache.invalidate()
+                time.sleep(5)
+
+    thread = threading.Thread(target=listen, name='product-cache-invalidation', daemon=True)
+    thread.start()
+    return thread
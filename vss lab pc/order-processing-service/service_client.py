@@ -0,0 +1,271 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Methods that are safe to send again after a connection error or gateway failure
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRYABLE_STATUS_CODES = frozenset([502, 503, 504])
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class UpstreamUnavailable(requests.RequestException):
+    """Call rejected locally because the upstream is unhealthy or saturated"""
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    """The upstream's circuit breaker is open"""
+
+
+class BulkheadFullError(UpstreamUnavailable):
+    """All concurrent-call slots for the upstream are taken"""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by consecutive failures
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    rejects calls for `recovery_timeout` seconds. It then lets up to
+    `half_open_max_calls` trial calls through: a success closes it again,
+    a failure re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30, half_open_max_calls=1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow(self):
+        """Return True if a call may go through right now"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            return False
+
+    def retry_after(self):
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.recovery_timeout - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._half_open_calls = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._half_open_calls = 0
+
+    def _maybe_half_open(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+
+    def to_dict(self):
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'times_opened': self.times_opened,
+                'failure_threshold': self.failure_threshold,
+                'recovery_timeout': self.recovery_timeout
+            }
+
+
+class UpstreamMetrics:
+    """Thread-safe call counters and latency histogram for one upstream"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, latency, error=False):
+        with self._lock:
+            self.requests += 1
+            if error:
+                self.errors += 1
+            self.latency_sum += latency
+            self.latency_max = max(self.latency_max, latency)
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    self.buckets[index] += 1
+                    break
+            else:
+                self.buckets[-1] += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def histogram(self):
+        """(per-bucket counts with the overflow bucket last, latency sum)"""
+        with self._lock:
+            return list(self.buckets), self.latency_sum
+
+    def to_dict(self):
+        with self._lock:
+            labels = [f'le_{bound}' for bound in LATENCY_BUCKETS] + ['le_inf']
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'retries': self.retries,
+                'rejected': self.rejected,
+                'error_rate': round(self.errors / self.requests, 4) if self.requests else 0.0,
+                'latency_avg_ms': round(self.latency_sum / self.requests * 1000, 2) if self.requests else 0.0,
+                'latency_max_ms': round(self.latency_max * 1000, 2),
+                'latency_histogram': dict(zip(labels, self.buckets))
+            }
+
+
+class ServiceClient:
+    """Keep-alive HTTP client for one upstream service
+
+    Connections are pooled per upstream. Idempotent calls are retried with
+    jittered exponential backoff on connection errors and 502/503/504.
+    A circuit breaker fails calls fast while the upstream is unhealthy and a
+    bulkhead caps how many calls may be in flight at once.
+    """
+
+    def __init__(self, name, base_url, pool_size=10, timeout=5, max_retries=2,
+                 backoff_base=0.05, backoff_max=1.0, max_concurrency=10,
+                 bulkhead_timeout=0.1, breaker=None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.metrics = UpstreamMetrics()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_concurrency = max_concurrency
+        self.bulkhead_timeout = bulkhead_timeout
+        self._bulkhead = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, path, idempotent=None, **kwargs):
+        """Send a request and return the response; raises the last error if every attempt fails
+
+        `idempotent` overrides the method-based retry decision, e.g. for a
+        read-only POST such as token verification. Raises UpstreamUnavailable
+        without touching the network when the breaker is open or the bulkhead
+        is full.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        attempts = 1 + (self.max_retries if idempotent else 0)
+        kwargs.setdefault('timeout', self.timeout)
+        url = f'{self.base_url}{path}'
+
+        for attempt in range(attempts):
+            if attempt:
+                self.metrics.record_retry()
+                time.sleep(self._backoff(attempt))
+
+            if not self._bulkhead.acquire(timeout=self.bulkhead_timeout):
+                self.metrics.record_rejected()
+                raise BulkheadFullError(f'{self.name} has {self.max_concurrency} calls in flight')
+            # Checked with a slot in hand so a half-open trial call is never stranded
+            if not self.breaker.allow():
+                self._bulkhead.release()
+                self.metrics.record_rejected()
+                raise CircuitOpenError(f'{self.name} circuit is open', retry_after=self.breaker.retry_after())
+
+            with self._in_flight_lock:
+                self._in_flight += 1
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException:
+                self.metrics.observe(time.perf_counter() - started, error=True)
+                self.breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    raise
+                continue
+            finally:
+                with self._in_flight_lock:
+                    self._in_flight -= 1
+                self._bulkhead.release()
+
+            failed = response.status_code >= 500
+            self.metrics.observe(time.perf_counter() - started, error=failed)
+            if failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt + 1 < attempts:
+                continue
+            return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request('PATCH', path, **kwargs)
+
+    def _backoff(self, attempt):
+        # Full jitter keeps retrying workers from synchronising against a recovering upstream
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def stats(self):
+        stats = self.metrics.to_dict()
+        stats['base_url'] = self.base_url
+        stats['circuit_breaker'] = self.breaker.to_dict()
+        stats['bulkhead'] = {'max_concurrency': self.max_concurrency, 'in_flight': self._in_flight}
+        return stats
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [SERVICE_DIR, os.path.join(SERVICE_DIR, '..', 'shared')]
+
+# The app reads its configuration at import time
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='order-tests-'), 'orders.db')
+os.environ['QUERY_PROFILER'] = 'true'
+os.environ['APP_ENV'] = 'test'
+# Keep every tested limit off the cached default first page of /orders/user/<id>
+os.environ['ORDER_PAGE_DEFAULT_LIMIT'] = '20'
+
+import app_v2  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    with app_v2.app.app_context():
+        app_v2.db.create_all()
+        yield app_v2.app
+        app_v2.db.session.remove()
+        app_v2.db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(monkeypatch):
+    """Authenticate requests as the given user without calling the auth service"""
+
+    def login_as(user_id, role='customer'):
+        monkeypatch.setattr(app_v2, 'verify_auth_token', lambda token: {'user_id': user_id, 'role': role})
+        return {'Authorization': 'Bearer test-token'}
+
+    return login_as
+
+
+PRODUCT = {'id': 1, 'name': 'Widget', 'price': 10.0, 'discounted_price': None, 'stock_quantity': 100}
+
+
+@pytest.fixture
+def product_service(monkeypatch):
+    """Serve one product and accept every stock change, without the product service"""
+    app_v2.product_cache.invalidate()
+    monkeypatch.setattr(app_v2, 'fetch_products_batch',
+                        lambda product_ids: {product_id: PRODUCT if product_id == 1 else None
+                                             for product_id in product_ids})
+    monkeypatch.setattr(app_v2, 'update_product_stock', lambda product_id, quantity_change: True)
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import app_v2
+from app_v2 import Order, OrderItem, rebuild_analytics, record_orders_created
+
+ANALYTICS = ('/analytics/revenue', '/analytics/orders-by-status', '/analytics/payment-status', '/analytics/top-products')
+
+
+def test_rollup_rows_are_locked_in_the_same_order_for_every_cart(app, monkeypatch):
+    touched = []
+    monkeypatch.setattr(app_v2, 'bump_rollup', lambda model, key, increments, **fields: touched.append((model, key)))
+
+    def order_with(product_ids):
+        order = Order(user_id=1, total_amount=10.0, status='pending', payment_status='pending',
+                      order_date=datetime(2024, 1, 1))
+        return order, [OrderItem(product_id=product_id, product_name='Widget', quantity=1, price=5.0)
+                       for product_id in product_ids]
+
+    record_orders_created([order_with([3, 1, 2])])
+    first = list(touched)
+    touched.clear()
+    record_orders_created([order_with([2, 3, 1])])
+
+    assert touched == first
+    assert [key for model, key in first if model is app_v2.ProductSalesRollup] == [
+        {'product_id': 1}, {'product_id': 2}, {'product_id': 3}
+    ]
+
+
+def test_incremental_rollups_match_a_rebuild(client, login, product_service):
+    headers = login(1, 'admin')
+    cancelled = client.post('/orders', json={'items': [{'product_id': 1, 'quantity': 1}]}, headers=headers).get_json()
+    delivered = client.post('/orders', json={'items': [{'product_id': 1, 'quantity': 2}], 'payment_status': 'paid'},
+                            headers=headers).get_json()
+    for status in ('processing', 'delivered'):
+        client.patch(f'/orders/{delivered["id"]}/status', json={'status': status}, headers=headers)
+    client.patch(f'/orders/{cancelled["id"]}/status', json={'status': 'cancelled'}, headers=headers)
+    client.patch(f'/orders/{cancelled["id"]}/status', json={'status': 'pending'}, headers=headers)
+    client.patch(f'/orders/{cancelled["id"]}/status', json={'status': 'cancelled'}, headers=headers)
+
+    incremental = {path: client.get(path, headers=headers).get_json() for path in ANALYTICS}
+    rebuild_analytics()
+    rebuilt = {path: client.get(path, headers=headers).get_json() for path in ANALYTICS}
+
+    assert incremental == rebuilt
+    # Statuses every order has moved on from are not reported as zero rows
+    assert set(incremental['/analytics/orders-by-status']) == {'cancelled', 'delivered'}
@@ -0,0 +1,63 @@
+import app_v2
+
+
+def test_bulk_reports_malformed_orders_per_index(client, login):
+    headers = login(1, 'admin')
+    orders = [
+        {'user_id': '1', 'items': [{'product_id': 1, 'quantity': 1}]},
+        {'user_id': True, 'items': [{'product_id': 1, 'quantity': 1}]},
+        {'items': [{'product_id': '1', 'quantity': 1}]},
+        {'items': [{'product_id': 1, 'quantity': 1.5}]},
+        {'items': [{'product_id': 1, 'quantity': True}]},
+        {'items': ['not an item']},
+        {'items': {'product_id': 1}},
+    ]
+
+    response = client.post('/orders/bulk', json={'orders': orders}, headers=headers)
+
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['created'] == 0
+    assert [(result['index'], result['status'], result['error']) for result in body['results']] == [
+        (0, 'failed', 'user_id must be an integer'),
+        (1, 'failed', 'user_id must be an integer'),
+        (2, 'failed', 'product_id must be an integer'),
+        (3, 'failed', 'Quantity must be an integer'),
+        (4, 'failed', 'Quantity must be an integer'),
+        (5, 'failed', 'Each item must be an object'),
+        (6, 'failed', 'items must be a list'),
+    ]
+
+
+def test_bulk_creates_valid_orders_next_to_malformed_ones(client, login, product_service):
+    headers = login(1, 'admin')
+    orders = [
+        {'items': [{'product_id': 1, 'quantity': 2}]},
+        {'user_id': 2.0, 'items': [{'product_id': 1, 'quantity': 1}]},
+    ]
+
+    response = client.post('/orders/bulk', json={'orders': orders}, headers=headers)
+
+    assert response.status_code == 207
+    results = response.get_json()['results']
+    assert results[0]['status'] == 'created'
+    assert results[0]['total_amount'] == 20.0
+    assert results[1] == {'index': 1, 'status': 'failed', 'error': 'user_id must be an integer', 'status_code': 400}
+
+
+def test_bulk_gives_back_stock_when_the_commit_fails(client, login, product_service, monkeypatch):
+    headers = login(1, 'admin')
+    stock_changes = []
+    monkeypatch.setattr(app_v2, 'update_product_stock',
+                        lambda product_id, quantity_change: stock_changes.append((product_id, quantity_change)) or True)
+
+    def fail_commit(orders_with_items):
+        raise RuntimeError('database went away')
+
+    monkeypatch.setattr(app_v2, 'record_orders_created', fail_commit)
+    orders = [{'items': [{'product_id': 1, 'quantity': 2}]}, {'items': [{'product_id': 1, 'quantity': 3}]}]
+
+    response = client.post('/orders/bulk', json={'orders': orders}, headers=headers)
+
+    assert response.status_code == 500
+    assert stock_changes == [(1, 5), (1, -5)]
@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app_v2 import Order, OrderItem, archive_orders, db
+
+
+@pytest.fixture
+def archived_history(app):
+    """One old delivered order moved to the archive, one recent order still hot"""
+    now = datetime.utcnow()
+    for order_date, status in ((now - timedelta(days=400), 'delivered'), (now - timedelta(days=1), 'pending')):
+        order = Order(user_id=1, total_amount=25.0, status=status, order_date=order_date)
+        db.session.add(order)
+        db.session.flush()
+        db.session.add(OrderItem(order_id=order.id, product_id=7, product_name='Widget', quantity=5, price=5.0))
+    db.session.commit()
+    assert archive_orders(365) == 1
+    return now
+
+
+def export(client, headers, **params):
+    response = client.get('/orders/export', query_string=params, headers=headers)
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_export_with_a_date_range_includes_archived_orders(client, login, archived_history):
+    headers = login(99, 'admin')
+    date_range = {'since': (archived_history - timedelta(days=500)).isoformat(), 'until': archived_history.isoformat()}
+
+    listed = client.get('/orders', query_string=date_range, headers=headers).get_json()
+    exported = [json.loads(line) for line in export(client, headers, **date_range).splitlines()]
+
+    assert [order['id'] for order in exported] == [order['id'] for order in reversed(listed)] == [1, 2]
+    assert exported[0]['archived'] is True
+    assert exported[0]['total_amount'] == 25.0
+    assert exported[0]['items'][0]['product_name'] == 'Widget'
+
+    rows = list(csv.DictReader(io.StringIO(export(client, headers, format='csv', **date_range))))
+    assert [(row['order_id'], row['status'], row['product_name']) for row in rows] == [
+        ('1', 'delivered', 'Widget'), ('2', 'pending', 'Widget')
+    ]
+
+
+def test_export_without_a_date_range_skips_archived_orders(client, login, archived_history):
+    exported = [json.loads(line) for line in export(client, login(99, 'admin')).splitlines()]
+    assert [order['id'] for order in exported] == [2]
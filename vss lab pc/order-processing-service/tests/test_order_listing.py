@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app_v2 import Order, OrderItem, db
+from query_profiler import PROFILE_HEADER
+
+LIMITS = (1, 10, 50)
+
+
+@pytest.fixture
+def orders(app):
+    """60 orders with two items each for each of two users"""
+    started = datetime(2024, 1, 1)
+    for n in range(120):
+        order = Order(user_id=1 + n % 2, total_amount=30.0, order_date=started + timedelta(minutes=n))
+        db.session.add(order)
+        db.session.flush()
+        db.session.add_all([
+            OrderItem(order_id=order.id, product_id=1, product_name='Widget', quantity=1, price=10.0),
+            OrderItem(order_id=order.id, product_id=2, product_name='Gadget', quantity=2, price=10.0),
+        ])
+    db.session.commit()
+
+
+def statement_count(response):
+    """Statements the request ran, from the query profiler's summary header"""
+    fields = dict(field.split('=') for field in response.headers[PROFILE_HEADER].split('; '))
+    return int(fields['queries'])
+
+
+@pytest.mark.parametrize('path, user', [
+    ('/orders/user/1', (1, 'customer')),
+    ('/orders', (99, 'admin')),
+])
+def test_listing_statement_count_does_not_grow_with_limit(client, login, orders, path, user):
+    headers = login(*user)
+    counts = {}
+    for limit in LIMITS:
+        response = client.get(path, query_string={'limit': limit}, headers=headers)
+        assert response.status_code == 200
+        assert len(response.get_json()) == limit
+        assert all(len(order['items']) == 2 for order in response.get_json())
+        counts[limit] = statement_count(response)
+    assert len(set(counts.values())) == 1, counts
@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta
+
+from app_v2 import ArchivedOrder, Order, archive_orders, build_order_summary, db
+
+
+def test_summary_aggregates_archived_orders_without_decoding_them(app, monkeypatch):
+    old = datetime.utcnow() - timedelta(days=400)
+    for n, (status, amount) in enumerate((('delivered', 10.0), ('delivered', 15.0), ('cancelled', 99.0))):
+        db.session.add(Order(user_id=1, total_amount=amount, status=status, order_date=old + timedelta(minutes=n)))
+    db.session.add(Order(user_id=1, total_amount=5.0, status='pending'))
+    db.session.commit()
+    assert archive_orders(365) == 3
+
+    def decode(self):
+        raise AssertionError('summary decoded an archived payload')
+
+    monkeypatch.setattr(ArchivedOrder, 'to_dict', decode)
+    summary = build_order_summary(1)
+
+    assert summary['orders_by_status'] == {'delivered': 2, 'cancelled': 1, 'pending': 1}
+    assert summary['order_count'] == 4
+    assert summary['lifetime_spend'] == 30.0
@@ -0,0 +1,48 @@
+import app_v2
+
+
+def quote(client, headers, quantity=2):
+    response = client.post('/orders/quote', json={'items': [{'product_id': 1, 'quantity': quantity}]},
+                           headers=headers)
+    assert response.status_code == 200
+    return response.get_json()['quote_token']
+
+
+def test_quote_can_only_be_redeemed_once(client, login, product_service):
+    headers = login(1)
+    token = quote(client, headers)
+
+    first = client.post('/orders', json={'quote_token': token}, headers=headers)
+    assert first.status_code == 201
+    assert first.get_json()['total_amount'] == 20.0
+
+    second = client.post('/orders', json={'quote_token': token}, headers=headers)
+    assert second.status_code == 409
+    assert second.get_json() == {'error': 'Quote has already been used'}
+
+
+def test_quote_is_not_used_up_by_a_failed_order(client, login, product_service, monkeypatch):
+    headers = login(1)
+    token = quote(client, headers)
+
+    monkeypatch.setattr(app_v2, 'update_product_stock', lambda product_id, quantity_change: False)
+    assert client.post('/orders', json={'quote_token': token}, headers=headers).status_code == 500
+
+    monkeypatch.setattr(app_v2, 'update_product_stock', lambda product_id, quantity_change: True)
+    assert client.post('/orders', json={'quote_token': token}, headers=headers).status_code == 201
+
+
+def test_malformed_items_sent_with_a_quote_are_rejected(client, login, product_service):
+    headers = login(1)
+    token = quote(client, headers)
+
+    for items, error in [([1], 'Each item must be an object'),
+                         ([{'product_id': '1', 'quantity': 2}], 'product_id must be an integer'),
+                         ([{'product_id': 1, 'quantity': -2}], 'Quantity must be greater than 0'),
+                         ({'product_id': 1}, 'items must be a list')]:
+        response = client.post('/orders', json={'quote_token': token, 'items': items}, headers=headers)
+        assert response.status_code == 400
+        assert response.get_json() == {'error': error}
+
+    # None of the rejected requests used the quote up
+    assert client.post('/orders', json={'quote_token': token}, headers=headers).status_code == 201
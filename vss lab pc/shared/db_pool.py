@@ -0,0 +1,143 @@
+"""Database connection pool settings shared by the product, auth and order services.
+
+Every v2 service builds its SQLAlchemy engine options with `engine_options()`,
+so pool sizing is configured the same way everywhere (environment):
+
+    DB_POOL_SIZE          connections kept open per process (default 5)
+    DB_MAX_OVERFLOW       extra connections allowed under bursts (default 10)
+    DB_POOL_TIMEOUT       seconds to wait for a free connection before failing (default 10)
+    DB_POOL_RECYCLE       reopen connections older than this many seconds (default 1800)
+    DB_POOL_PRE_PING      test connections on checkout so a restarted Postgres is
+                          survived without errors (default true)
+    DB_POOL_WARM          connections opened at startup (default 2, capped at DB_POOL_SIZE)
+    DB_CONNECT_TIMEOUT    Postgres connect timeout in seconds (default 10)
+
+Each process holds up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections, so
+multiply by the number of Gunicorn workers when sizing max_connections.
+
+The pool also records how long checkouts wait and how often they time out;
+`instrumentation.db_pool_collector` exports these on /metrics.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolStats:
+    """Checkout wait times, timeouts and connections opened for one engine's pool"""
+
+    def __init__(self, name):
+        self.name = name
+        self.wait_buckets = [0] * (len(POOL_WAIT_BUCKETS) + 1)
+        self.wait_sum = 0.0
+        self.timeouts = 0
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+
+    def observe_wait(self, seconds, timed_out=False):
+        index = bisect.bisect_left(POOL_WAIT_BUCKETS, seconds)
+        with self._lock:
+            self.wait_buckets[index] += 1
+            self.wait_sum += seconds
+            if timed_out:
+                self.timeouts += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def histogram(self):
+        with self._lock:
+            return list(self.wait_buckets), self.wait_sum
+
+    def to_dict(self):
+        with self._lock:
+            checkouts = sum(self.wait_buckets)
+            return {
+                'checkouts': checkouts,
+                'avg_wait_ms': round(self.wait_sum / checkouts * 1000, 3) if checkouts else 0.0,
+                'timeouts': self.timeouts,
+                'connections_opened': self.connections_opened,
+            }
+
+
+def timed_pool_class(stats):
+    """A QueuePool subclass that reports into `stats`
+
+    A subclass rather than pool events because SQLAlchemy has no event for the
+    start of a checkout; recreate() after dispose() keeps the class, and with it
+    the stats.
+    """
+
+    class TimedQueuePool(QueuePool):
+        pool_stats = stats
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                stats.observe_wait(time.perf_counter() - started, timed_out=True)
+                raise
+            stats.observe_wait(time.perf_counter() - started)
+            return connection
+
+        def _create_connection(self):
+            stats.record_connect()
+            return super()._create_connection()
+
+    return TimedQueuePool
+
+
+def env_int(name, default):
+    return int(os.getenv(name, str(default)))
+
+
+def engine_options(database_url, name='primary'):
+    """SQLALCHEMY_ENGINE_OPTIONS for `database_url`, sized from the environment"""
+    options = {
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        'pool_recycle': env_int('DB_POOL_RECYCLE', 1800),
+    }
+    # In-memory SQLite lives in a single connection; leave its pool alone
+    if database_url.startswith('sqlite') and (':memory:' in database_url or database_url.rstrip('/') == 'sqlite:'):
+        return options
+    options.update({
+        'poolclass': timed_pool_class(PoolStats(name)),
+        'pool_size': env_int('DB_POOL_SIZE', 5),
+        'max_overflow': env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    })
+    if database_url.startswith('postgresql'):
+        options['connect_args'] = {'connect_timeout': env_int('DB_CONNECT_TIMEOUT', 10)}
+    return options
+
+
+def warm_pool(engine, count=None):
+    """Open `count` connections up front so the first requests do not pay connect latency
+
+    Failures are logged, not raised: a database that is still starting must not
+    stop the service from booting, and pre-ping recovers later checkouts.
+    """
+    pool_size = engine.pool.size() if hasattr(engine.pool, 'size') else 1
+    count = min(env_int('DB_POOL_WARM', 2) if count is None else count, pool_size)
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(engine.connect())
+    except Exception as e:
+        logger.warning(f"Database pool warm-up stopped after {len(connections)} connections: {str(e)}")
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
@@ -0,0 +1,94 @@
+"""Gunicorn settings shared by the v2 services.
+
+The v2 images copy this file to /app/gunicorn.conf.py, where Gunicorn picks
+it up by itself (`gunicorn app:app`). To run a service this way locally:
+
+    cd order-processing-service
+    PYTHONPATH=../shared gunicorn -c ../shared/gunicorn_conf.py app_v2:app
+
+Worker model (environment):
+    WEB_BIND                  address to listen on (default 0.0.0.0:8000)
+    WEB_WORKER_CLASS          sync (pre-fork, one request per process) or gthread (default,
+                              WEB_THREADS threads per process)
+    WEB_CONCURRENCY           worker processes (default 1, see below)
+    WEB_THREADS               threads per gthread worker (default 8)
+    WEB_PRELOAD               import the app once in the master so workers share its memory
+                              copy-on-write (default true)
+    WEB_MAX_REQUESTS          recycle a worker after this many requests, 0 to disable (default 2000)
+    WEB_MAX_REQUESTS_JITTER   random extra requests so workers do not recycle together (default 200)
+    WEB_TIMEOUT               seconds before a silent worker is killed and replaced (default 30)
+    WEB_GRACEFUL_TIMEOUT      seconds in-flight requests get on reload or shutdown (default 30)
+    WEB_KEEPALIVE             keep-alive seconds for client connections (default 5)
+    WEB_ACCESS_LOG            true to log every request to stdout (default false)
+
+Metrics, caches and /diagnostics live in each worker process, so with
+several workers a /metrics scrape reports only the worker that answered it.
+The default is therefore one gthread worker; to use more cores, run more
+containers (each scraped on its own) or raise WEB_CONCURRENCY knowing that
+per-scrape counters then cover a single worker.
+
+Send SIGHUP to the master for a graceful reload: new workers are started with
+the current settings and old ones finish their in-flight requests first. A
+preloaded app is not re-imported on HUP; to deploy new code without downtime
+send SIGUSR2 (start a new master) and then SIGQUIT to the old one.
+"""
+import os
+import subprocess
+import sys
+
+from db_pool import warm_pool
+
+CREATE_TABLES = 'from {module} import app, db\nwith app.app_context():\n    db.create_all()'
+
+
+def env_flag(name, default):
+    return os.getenv(name, 'true' if default else 'false').lower() == 'true'
+
+
+bind = os.getenv('WEB_BIND', '0.0.0.0:8000')
+worker_class = os.getenv('WEB_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+threads = int(os.getenv('WEB_THREADS', '8'))
+preload_app = env_flag('WEB_PRELOAD', True)
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', '200'))
+timeout = int(os.getenv('WEB_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('WEB_KEEPALIVE', '5'))
+accesslog = '-' if env_flag('WEB_ACCESS_LOG', False) else None
+errorlog = '-'
+
+# Async workers (gevent, eventlet) would also need their libraries and a green Postgres driver
+if worker_class not in ('sync', 'gthread'):
+    raise RuntimeError(f'WEB_WORKER_CLASS must be sync or gthread, not {worker_class!r}')
+
+
+def app_module_name(arbiter_or_worker):
+    return arbiter_or_worker.app.app_uri.split(':')[0]
+
+
+def on_starting(server):
+    """Create missing tables once, before any worker exists"""
+    module_name = app_module_name(server)
+    if preload_app:
+        module = sys.modules[module_name]
+        with module.app.app_context():
+            module.db.create_all()
+            # Connections opened here must not be inherited by the forked workers
+            for engine in module.db.engines.values():
+                engine.dispose()
+    else:
+        # Keep the master free of the app; workers import it themselves
+        subprocess.run([sys.executable, '-c', CREATE_TABLES.format(module=module_name)], check=True)
+
+
+def post_worker_init(worker):
+    """Open this worker's own pool connections and start its background work"""
+    module = sys.modules[app_module_name(worker)]
+    with module.app.app_context():
+        for engine in module.db.engines.values():
+            engine.dispose(close=False)
+            warm_pool(engine)
+    start_background_tasks = getattr(module, 'start_background_tasks', None)
+    if start_background_tasks is not None:
+        start_background_tasks()
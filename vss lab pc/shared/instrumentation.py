@@ -0,0 +1,260 @@
+"""Request metrics shared by the product, auth and order services.
+
+A small in-process registry rendered in the Prometheus text exposition
+format. Recording a request costs two clock reads, a couple of dict lookups
+and a bisect under a lock, so it stays on for every request. Values that
+already live elsewhere (cache statistics, connection pools, upstream client
+counters) are read by collector callbacks only when /metrics is scraped.
+"""
+import bisect
+import threading
+import time
+
+from flask import Response, g, request
+
+from db_pool import POOL_WAIT_BUCKETS
+
+# Upper bounds (seconds) of the request latency histogram buckets
+REQUEST_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels.items()) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricFamily:
+    """One metric name with its samples, as produced by a collector"""
+
+    def __init__(self, name, metric_type, help_text, samples=None):
+        self.name = name
+        self.type = metric_type
+        self.help = help_text
+        # (sample name suffix, labels dict, value)
+        self.samples = samples or []
+
+    def add(self, labels, value, suffix=''):
+        self.samples.append((suffix, labels, value))
+        return self
+
+    def add_histogram(self, labels, bounds, counts, total):
+        """Add a histogram from per-bucket (non-cumulative) counts; counts[-1] is the overflow bucket"""
+        cumulative = 0
+        for bound, count in zip(list(bounds) + [float('inf')], counts):
+            cumulative += count
+            self.samples.append(('_bucket', dict(labels, le=format_value(float(bound))), cumulative))
+        self.samples.append(('_sum', labels, total))
+        self.samples.append(('_count', labels, cumulative))
+        return self
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for suffix, labels, value in self.samples:
+            lines.append(f'{self.name}{suffix}{format_labels(labels)} {format_value(value)}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+        family = MetricFamily(self.name, 'counter', self.help)
+        for label_values, value in sorted(values.items()):
+            family.add(dict(zip(self.label_names, label_values)), value)
+        return [family]
+
+
+class Gauge(Counter):
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def collect(self):
+        family = super().collect()[0]
+        family.type = 'gauge'
+        return [family]
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=REQUEST_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last is overflow), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        with self._lock:
+            series = {label_values: (list(counts), total) for label_values, (counts, total) in self._series.items()}
+        family = MetricFamily(self.name, 'histogram', self.help)
+        for label_values, (counts, total) in sorted(series.items()):
+            family.add_histogram(dict(zip(self.label_names, label_values)), self.buckets, counts, total)
+        return [family]
+
+
+class MetricsRegistry:
+    """Metrics plus collector callbacks, rendered together on scrape"""
+
+    def __init__(self, const_labels=None):
+        self.const_labels = const_labels or {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric (anything with collect()) or a callable returning MetricFamily objects"""
+        with self._lock:
+            self._collectors.append(metric)
+        return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self.register(Counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, label_names=()):
+        return self.register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=REQUEST_LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self):
+        with self._lock:
+            collectors = list(self._collectors)
+        lines = []
+        for collector in collectors:
+            try:
+                families = collector.collect() if hasattr(collector, 'collect') else collector()
+            except Exception:
+                # One broken collector must not take the whole scrape down
+                continue
+            for family in families:
+                if self.const_labels:
+                    family.samples = [(suffix, dict(self.const_labels, **labels), value)
+                                      for suffix, labels, value in family.samples]
+                lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
+
+
+def db_pool_collector(db):
+    """Connection pool size, usage and checkout timing for each Flask-SQLAlchemy engine (primary, replica)"""
+
+    def collect():
+        connections = MetricFamily('db_pool_connections', 'gauge', 'Database connection pool connections by state')
+        wait = MetricFamily('db_pool_wait_seconds', 'histogram', 'Time spent waiting for a pooled connection')
+        timeouts = MetricFamily('db_pool_timeouts_total', 'counter', 'Checkouts that gave up waiting for a connection')
+        opened = MetricFamily('db_pool_connections_opened_total', 'counter', 'Database connections opened by the pool')
+        for bind_key, engine in db.engines.items():
+            pool = engine.pool
+            labels = {'pool': bind_key or 'primary'}
+            # SQLite's pools do not track checkouts; only report what the pool implements
+            for state, method in (('size', 'size'), ('checked_out', 'checkedout'), ('idle', 'checkedin')):
+                if hasattr(pool, method):
+                    connections.add(dict(labels, state=state), getattr(pool, method)())
+            if hasattr(pool, 'overflow'):
+                # QueuePool reports unopened slots as negative overflow
+                connections.add(dict(labels, state='overflow'), max(0, pool.overflow()))
+            # Checkout timing from db_pool.timed_pool_class
+            stats = getattr(pool, 'pool_stats', None)
+            if stats is not None:
+                buckets, wait_sum = stats.histogram()
+                summary = stats.to_dict()
+                wait.add_histogram(labels, POOL_WAIT_BUCKETS, buckets, wait_sum)
+                timeouts.add(labels, summary['timeouts'])
+                opened.add(labels, summary['connections_opened'])
+        return [family for family in (connections, wait, timeouts, opened) if family.samples]
+
+    return collect
+
+
+def cache_collector(caches):
+    """Hit/miss counters and hit ratio for objects with a stats() dict ({label: cache})"""
+
+    def collect():
+        hits = MetricFamily('cache_hits_total', 'counter', 'Cache lookups served from the cache')
+        misses = MetricFamily('cache_misses_total', 'counter', 'Cache lookups that missed')
+        ratio = MetricFamily('cache_hit_ratio', 'gauge', 'Share of cache lookups that hit since start')
+        for label, cache in caches.items():
+            stats = cache.stats()
+            hits.add({'cache': label}, stats['hits'])
+            misses.add({'cache': label}, stats['misses'])
+            ratio.add({'cache': label}, stats['hit_ratio'])
+        return [hits, misses, ratio]
+
+    return collect
+
+
+def instrument_app(app, service, db=None, registry=None, path='/metrics'):
+    """Record per-route request counts and latency and expose them on `path`
+
+    Routes are labelled with their URL rule (e.g. /orders/<int:order_id>) so
+    label cardinality stays bounded. Returns the registry so services can add
+    their own metrics and collectors.
+    """
+    registry = registry or MetricsRegistry({'service': service})
+    requests_total = registry.counter(
+        'http_requests_total', 'HTTP requests by route, method and status code', ('method', 'route', 'status'))
+    latency = registry.histogram(
+        'http_request_duration_seconds', 'HTTP request latency by route and method', ('method', 'route'))
+    in_flight = registry.gauge('http_requests_in_flight', 'HTTP requests currently being served')
+    if db is not None:
+        registry.register(db_pool_collector(db))
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        in_flight.inc()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            in_flight.dec()
+            if request.path != path:
+                route = request.url_rule.rule if request.url_rule else 'unmatched'
+                latency.observe(time.perf_counter() - started, request.method, route)
+                requests_total.inc(request.method, route, str(response.status_code))
+        return response
+
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule(path, 'metrics', metrics, methods=['GET'])
+    return registry
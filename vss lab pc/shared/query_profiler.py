@@ -0,0 +1,165 @@
+"""Opt-in per-request SQL profiling shared by the product, auth and order services.
+
+With QUERY_PROFILER=true every statement executed while handling a request is
+counted and timed. Then, per request:
+
+- statements slower than QUERY_PROFILER_SLOW_MS are logged with their
+  parameters and the database's query plan;
+- statement shapes (the SQL with literals and placeholders collapsed) seen at
+  least QUERY_PROFILER_REPEAT_THRESHOLD times are logged as probable N+1 loads;
+- outside production (APP_ENV != production) the summary is returned in an
+  X-Query-Profile header, e.g. `queries=14; db_ms=9.3; repeated=1`.
+
+Statements run outside a request (workers, CLI commands) are not profiled.
+"""
+import contextvars
+import logging
+import os
+import re
+import time
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Query-Profile'
+MAX_LOGGED_PARAMETERS = 500
+
+# Literals and bind placeholders in any of the DBAPI paramstyles
+LITERAL = re.compile(r"'(?:[^']|'')*'|%\(\w+\)s|%s|\$\d+|:\w+|\?|\b\d+(?:\.\d+)?\b")
+# Runs of placeholders, as produced by expanding IN lists of different lengths
+PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+WHITESPACE = re.compile(r'\s+')
+
+EXPLAIN_PREFIXES = {'postgresql': 'EXPLAIN ', 'sqlite': 'EXPLAIN QUERY PLAN '}
+
+_profile = contextvars.ContextVar('query_profile', default=None)
+
+
+def statement_shape(statement):
+    """The statement with literals and placeholders collapsed, so repeated loads compare equal"""
+    shape = LITERAL.sub('?', statement)
+    shape = PLACEHOLDER_LIST.sub('?', shape)
+    return WHITESPACE.sub(' ', shape).strip()
+
+
+class RequestProfile:
+    """Query count, DB time and per-shape repeats for one request"""
+
+    __slots__ = ('queries', 'db_time', 'shapes')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        # shape -> [executions, seconds]
+        self.shapes = {}
+
+    def record(self, statement, duration):
+        self.queries += 1
+        self.db_time += duration
+        shape = statement_shape(statement)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            self.shapes[shape] = [1, duration]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+
+    def repeated(self, threshold):
+        return {shape: entry for shape, entry in self.shapes.items() if entry[0] >= threshold}
+
+
+class QueryProfiler:
+    def __init__(self, service, slow_ms=100, repeat_threshold=5, explain=True, header=True):
+        self.service = service
+        self.slow_seconds = slow_ms / 1000
+        self.repeat_threshold = repeat_threshold
+        self.explain = explain
+        self.header = header
+
+    def install(self, app):
+        app.before_request(self.start_profile)
+        app.after_request(self.finish_profile)
+        app.teardown_request(self.clear_profile)
+        event.listen(Engine, 'before_cursor_execute', self.before_execute)
+        event.listen(Engine, 'after_cursor_execute', self.after_execute)
+
+    def start_profile(self):
+        g.query_profile_token = _profile.set(RequestProfile())
+
+    def finish_profile(self, response):
+        profile = _profile.get()
+        if profile is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else request.path
+        repeated = profile.repeated(self.repeat_threshold)
+        for shape, (count, seconds) in repeated.items():
+            logger.warning(f"[{self.service}] Probable N+1 in {request.method} {route}: "
+                           f"{count} executions ({seconds * 1000:.1f} ms) of: {shape}")
+        if self.header:
+            response.headers[PROFILE_HEADER] = (
+                f'queries={profile.queries}; db_ms={profile.db_time * 1000:.1f}; repeated={len(repeated)}')
+        return response
+
+    def clear_profile(self, error=None):
+        token = g.pop('query_profile_token', None)
+        if token is not None:
+            _profile.reset(token)
+
+    def before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if _profile.get() is not None:
+            conn.info.setdefault('query_profiler_started', []).append(time.perf_counter())
+
+    def after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        profile = _profile.get()
+        started = conn.info.get('query_profiler_started')
+        if profile is None or not started:
+            return
+        duration = time.perf_counter() - started.pop()
+        profile.record(statement, duration)
+        if duration >= self.slow_seconds:
+            plan = self.query_plan(conn, cursor, statement, parameters) if self.explain and not executemany else None
+            logger.warning(f"[{self.service}] Slow query ({duration * 1000:.1f} ms): {statement}\n"
+                           f"parameters: {repr(parameters)[:MAX_LOGGED_PARAMETERS]}"
+                           + (f"\nplan:\n{plan}" if plan else ''))
+
+    def query_plan(self, conn, cursor, statement, parameters):
+        """The database's plan for a read, run on the raw DBAPI connection so it is not profiled itself"""
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return None
+        postgres = conn.dialect.name == 'postgresql'
+        explain_cursor = cursor.connection.cursor()
+        try:
+            # A failed EXPLAIN must not abort the request's own Postgres transaction
+            if postgres:
+                explain_cursor.execute('SAVEPOINT query_profiler_explain')
+            try:
+                explain_cursor.execute(prefix + statement, parameters)
+                rows = explain_cursor.fetchall()
+            except Exception as e:
+                if postgres:
+                    explain_cursor.execute('ROLLBACK TO SAVEPOINT query_profiler_explain')
+                return f'unavailable ({str(e)})'
+            if postgres:
+                explain_cursor.execute('RELEASE SAVEPOINT query_profiler_explain')
+            return '\n'.join(str(row[-1]) for row in rows)
+        finally:
+            explain_cursor.close()
+
+
+def init_query_profiler(app, service):
+    """Install the profiler when QUERY_PROFILER=true; returns it, or None when disabled"""
+    if os.getenv('QUERY_PROFILER', 'false').lower() != 'true':
+        return None
+    profiler = QueryProfiler(
+        service,
+        slow_ms=float(os.getenv('QUERY_PROFILER_SLOW_MS', '100')),
+        repeat_threshold=int(os.getenv('QUERY_PROFILER_REPEAT_THRESHOLD', '5')),
+        explain=os.getenv('QUERY_PROFILER_EXPLAIN', 'true').lower() == 'true',
+        header=os.getenv('APP_ENV', 'development').lower() != 'production'
+    )
+    profiler.install(app)
+    return profiler
@@ -0,0 +1,250 @@
+"""Optional read-replica routing shared by the product, auth and order services.
+
+With DATABASE_REPLICA_URL set, SELECTs issued while handling GET and HEAD
+requests run on the replica; everything else (writes, other methods,
+background workers, CLI commands) uses the primary. A read goes to the
+primary instead when:
+
+- the replica is lagging more than REPLICA_MAX_LAG_SECONDS (default 5) behind,
+  or its lag could not be measured recently;
+- the same client wrote within READ_YOUR_WRITES_SECONDS (default 10), so a
+  user always sees their own changes (clients are matched by authenticated
+  user or bearer token, else by address);
+- the request sends `X-Read-Consistency: primary`, as service-to-service calls
+  that act on what they read (stock checks) do.
+
+Any successful request with another method counts as a write, except on
+endpoints marked with @read_only (token checks, quotes). Endpoints that write
+before the client has a token (register, login) call remember_user_write() so
+the user's next authenticated read sees the new rows.
+
+Recent writers are remembered in-process, or in Redis with
+READ_YOUR_WRITES_REDIS_URL so every worker and instance sees them.
+REPLICA_LAG_CHECK_INTERVAL (default 2) sets how often the lag is measured.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+from db_pool import engine_options
+from instrumentation import MetricFamily
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+CONSISTENCY_HEADER = 'X-Read-Consistency'
+READ_METHODS = ('GET', 'HEAD')
+
+# Seconds since the last replayed transaction, or 0 while the replica has replayed everything it received
+POSTGRES_LAG_QUERY = (
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+
+def user_key(user_id):
+    return f'user:{user_id}'
+
+
+def read_only(view):
+    """Mark a non-GET endpoint that writes nothing, so calling it does not pin the client to the primary
+
+    Apply it directly below @app.route, outside any auth decorator.
+    """
+    view.read_only = True
+    return view
+
+
+def remember_user_write(user_id):
+    """Record a write by `user_id` from a request that is not authenticated as that user yet"""
+    router = current_app.extensions.get('read_replica')
+    if router is not None:
+        router.recent_writes.mark(user_key(user_id))
+
+
+class RoutingSession(Session):
+    """db.session that sends SELECTs to the replica when the current request may use it"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and getattr(clause, 'is_select', False)
+                and getattr(clause, '_for_update_arg', None) is None and has_app_context()):
+            router = current_app.extensions.get('read_replica')
+            if router is not None and router.use_replica():
+                return router.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class RecentWrites:
+    """Clients that wrote within the last `window` seconds (in-process, or Redis-backed)"""
+
+    def __init__(self, window, redis_client=None, key_prefix='recent-write:', max_keys=100000):
+        self.window = window
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self.max_keys = max_keys
+        self._writes = {}
+        self._lock = threading.Lock()
+
+    def mark(self, client):
+        if self.redis is not None:
+            try:
+                self.redis.set(self.key_prefix + client, 1, px=int(self.window * 1000))
+                return
+            except Exception as e:
+                logger.warning(f"Recording recent write in Redis failed: {str(e)}")
+        now = time.monotonic()
+        with self._lock:
+            if len(self._writes) >= self.max_keys:
+                self._writes = {key: at for key, at in self._writes.items() if now - at < self.window}
+            self._writes[client] = now
+
+    def is_recent(self, client):
+        if self.redis is not None:
+            try:
+                return bool(self.redis.exists(self.key_prefix + client))
+            except Exception as e:
+                # Unsure means primary: never risk showing a user stale data
+                logger.warning(f"Checking recent writes in Redis failed: {str(e)}")
+                return True
+        with self._lock:
+            written_at = self._writes.get(client)
+        return written_at is not None and time.monotonic() - written_at < self.window
+
+
+class ReplicaRouter:
+    def __init__(self, app, db, max_lag=5.0, check_interval=2.0, recent_writes=None):
+        self.app = app
+        self.db = db
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.recent_writes = recent_writes or RecentWrites(10.0)
+        self.lag = None
+        self.lag_checked_at = 0.0
+        self.counts = {'replica': 0, 'primary_lag': 0, 'primary_recent_write': 0, 'primary_requested': 0}
+        self._counts_lock = threading.Lock()
+        self._monitor = None
+        self._monitor_lock = threading.Lock()
+        with app.app_context():
+            self.engine = db.engines[REPLICA_BIND]
+        app.extensions['read_replica'] = self
+        app.after_request(self.remember_write)
+
+    def use_replica(self):
+        """Whether reads in the current request go to the replica; decided once per request"""
+        if not has_request_context() or request.method not in READ_METHODS:
+            return False
+        decision = g.get('read_replica_decision')
+        if decision is None:
+            decision = g.read_replica_decision = self.choose()
+            with self._counts_lock:
+                self.counts[decision] += 1
+        return decision == 'replica'
+
+    def choose(self):
+        if request.headers.get(CONSISTENCY_HEADER, '').lower() == 'primary':
+            return 'primary_requested'
+        if not self.replica_current():
+            return 'primary_lag'
+        if any(self.recent_writes.is_recent(client) for client in self.client_keys()):
+            return 'primary_recent_write'
+        return 'replica'
+
+    def client_keys(self):
+        """Every identity known for the requester: the user (once authenticated), the token, else the address"""
+        keys = []
+        user = getattr(request, 'current_user', None)
+        if isinstance(user, dict) and user.get('user_id') is not None:
+            keys.append(user_key(user['user_id']))
+        authorization = request.headers.get('Authorization')
+        if authorization:
+            keys.append('token:' + hashlib.sha256(authorization.encode()).hexdigest()[:32])
+        return keys or [f'addr:{request.remote_addr}']
+
+    def remember_write(self, response):
+        view = current_app.view_functions.get(request.endpoint)
+        if (request.method not in READ_METHODS and response.status_code < 400
+                and not getattr(view, 'read_only', False)):
+            for client in self.client_keys():
+                self.recent_writes.mark(client)
+        return response
+
+    def replica_current(self):
+        """The replica's last measured lag is recent and within the limit"""
+        if self._monitor is None:
+            self._start_monitor()
+        return (self.lag is not None and self.lag <= self.max_lag
+                and time.monotonic() - self.lag_checked_at < self.check_interval * 3)
+
+    def _start_monitor(self):
+        # Started on first use so each forked worker runs its own
+        with self._monitor_lock:
+            if self._monitor is None:
+                self._monitor = threading.Thread(target=self._monitor_lag, name='replica-lag', daemon=True)
+                self._monitor.start()
+
+    def _monitor_lag(self):
+        while True:
+            try:
+                self.lag = self.measure_lag()
+            except Exception as e:
+                self.lag = None
+                logger.warning(f"Measuring replica lag failed: {str(e)}")
+            self.lag_checked_at = time.monotonic()
+            time.sleep(self.check_interval)
+
+    def measure_lag(self):
+        if self.engine.dialect.name != 'postgresql':
+            # Nothing to measure (e.g. a SQLite copy in local runs)
+            return 0.0
+        with self.engine.connect() as connection:
+            return float(connection.exec_driver_sql(POSTGRES_LAG_QUERY).scalar() or 0.0)
+
+    def stats(self):
+        with self._counts_lock:
+            counts = dict(self.counts)
+        return {'lag_seconds': self.lag, 'max_lag_seconds': self.max_lag, 'requests': counts}
+
+    def collect(self):
+        stats = self.stats()
+        requests_family = MetricFamily('db_read_requests_total', 'counter',
+                                       'Read requests by database target and reason')
+        for decision, count in stats['requests'].items():
+            target, _, reason = decision.partition('_')
+            requests_family.add({'target': target, 'reason': reason or 'default'}, count)
+        families = [requests_family]
+        if stats['lag_seconds'] is not None:
+            families.append(MetricFamily('db_replica_lag_seconds', 'gauge', 'Last measured replica lag')
+                            .add({}, stats['lag_seconds']))
+        return families
+
+
+def configure_read_replica(app):
+    """Add the replica bind when DATABASE_REPLICA_URL is set; call before SQLAlchemy(app)"""
+    replica_url = os.getenv('DATABASE_REPLICA_URL')
+    if replica_url:
+        app.config['SQLALCHEMY_BINDS'] = dict(
+            app.config.get('SQLALCHEMY_BINDS') or {},
+            **{REPLICA_BIND: dict(engine_options(replica_url, REPLICA_BIND), url=replica_url)}
+        )
+    return replica_url
+
+
+def init_read_replica(app, db, redis_module=None):
+    """Route reads to the configured replica; returns the router, or None without one"""
+    if REPLICA_BIND not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return None
+    redis_client = None
+    redis_url = os.getenv('READ_YOUR_WRITES_REDIS_URL')
+    if redis_url and redis_module is not None:
+        redis_client = redis_module.from_url(redis_url, decode_responses=True)
+    return ReplicaRouter(
+        app, db,
+        max_lag=float(os.getenv('REPLICA_MAX_LAG_SECONDS', '5')),
+        check_interval=float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', '2')),
+        recent_writes=RecentWrites(float(os.getenv('READ_YOUR_WRITES_SECONDS', '10')), redis_client)
+    )
@@ -0,0 +1,375 @@
+"""Correlation IDs and timing spans shared by the product, auth and order services.
+
+Every request gets a correlation ID: the caller's X-Request-ID if it sent a
+sane one, otherwise a new one. It is returned on the response and forwarded
+on every outbound call, together with a W3C `traceparent` header, so one ID
+follows a request through all three services.
+
+When an exporter is configured, each service also records spans: one per
+handled request, one per SQL statement and one per outbound HTTP call, plus
+any code wrapped with `tracer.span()` / `@tracer.traced()`. Spans are
+written in Zipkin v2 JSON, either as JSON lines (TRACE_EXPORTER=log) or
+POSTed in batches to a local collector such as Zipkin or Jaeger
+(TRACE_EXPORTER=zipkin). Exporting happens on a background thread; a full
+buffer drops spans rather than slowing requests down.
+
+Configuration (environment):
+    TRACE_EXPORTER        none (default), log or zipkin
+    TRACE_LOG_PATH        file for the log exporter; '-' (default) is stderr
+    TRACE_COLLECTOR_URL   zipkin exporter endpoint (default http://localhost:9411/api/v2/spans)
+    TRACE_SAMPLE_RATE     share of new traces to record (default 1.0)
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+from urllib.parse import urlsplit
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+TRACEPARENT_HEADER = 'traceparent'
+VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+MAX_STATEMENT_LENGTH = 1000
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_request_id = contextvars.ContextVar('request_id', default=None)
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def new_span_id():
+    return uuid.uuid4().hex[:16]
+
+
+class Span:
+    """A timed operation; finished spans are handed to the tracer for export"""
+
+    __slots__ = ('tracer', 'name', 'kind', 'trace_id', 'span_id', 'parent_id', 'sampled',
+                 'attributes', 'started_at', '_started', 'duration')
+
+    def __init__(self, tracer, name, kind, trace_id, parent_id, sampled, attributes=None):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = dict(attributes or {})
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def finish(self, error=None):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.attributes['error'] = str(error) or type(error).__name__
+        if self.sampled:
+            self.tracer.record(self)
+
+    def to_zipkin(self, service):
+        span = {
+            'traceId': self.trace_id,
+            'id': self.span_id,
+            'name': self.name,
+            'timestamp': int(self.started_at * 1000000),
+            'duration': max(1, int(self.duration * 1000000)),
+            'localEndpoint': {'serviceName': service},
+            'tags': {key: str(value) for key, value in self.attributes.items()},
+        }
+        if self.parent_id:
+            span['parentId'] = self.parent_id
+        if self.kind in ('server', 'client'):
+            span['kind'] = self.kind.upper()
+        if self.kind == 'db':
+            span['kind'] = 'CLIENT'
+            span['remoteEndpoint'] = {'serviceName': self.attributes.get('db.system', 'db')}
+        return span
+
+
+class JsonLogExporter:
+    """One Zipkin-format JSON object per line"""
+
+    def __init__(self, path='-'):
+        self.stream = sys.stderr if path == '-' else open(path, 'a', buffering=1)
+
+    def export(self, spans):
+        self.stream.write(''.join(json.dumps(span) + '\n' for span in spans))
+        self.stream.flush()
+
+
+class ZipkinExporter:
+    """POST batches to a Zipkin-compatible collector (Zipkin, Jaeger, OpenTelemetry collector)"""
+
+    def __init__(self, url, timeout=2):
+        self.url = url
+        self.timeout = timeout
+
+    def export(self, spans):
+        # urllib rather than requests: the auth service does not ship requests, and
+        # exporting must not go through an instrumented session
+        body = json.dumps(spans).encode()
+        req = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=self.timeout):
+            pass
+
+
+def exporter_from_env():
+    kind = os.getenv('TRACE_EXPORTER', 'none').lower()
+    if kind == 'log':
+        return JsonLogExporter(os.getenv('TRACE_LOG_PATH', '-'))
+    if kind == 'zipkin':
+        return ZipkinExporter(os.getenv('TRACE_COLLECTOR_URL', 'http://localhost:9411/api/v2/spans'))
+    return None
+
+
+class Tracer:
+    """Creates spans within the current request's trace and exports them in the background"""
+
+    def __init__(self, service, exporter=None, sample_rate=1.0, max_buffer=10000, batch_size=200,
+                 flush_interval=1.0):
+        self.service = service
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._buffer = queue.Queue(maxsize=max_buffer)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.exporter is not None
+
+    def start_span(self, name, kind='internal', attributes=None, trace_id=None, parent_id=None, sampled=None):
+        """Start a span under the current one (or a new trace); the caller must finish() it"""
+        parent = _current_span.get()
+        if trace_id is None and parent is not None:
+            trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+        if trace_id is None:
+            trace_id = uuid.uuid4().hex
+        if sampled is None:
+            sampled = self.enabled and random.random() < self.sample_rate
+        return Span(self, name, kind, trace_id, parent_id, sampled and self.enabled, attributes)
+
+    @contextmanager
+    def span(self, name, kind='internal', **attributes):
+        """Time a block as a child of the current span; it becomes current inside the block"""
+        span = self.start_span(name, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.finish(error=e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+
+    def traced(self, name=None):
+        """Decorator form of span()"""
+        def decorator(f):
+            span_name = name or f.__name__
+
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return f(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def outbound_headers(self, span=None):
+        """Headers that carry the correlation ID and trace context to another service"""
+        span = span or _current_span.get()
+        headers = {}
+        request_id = _request_id.get()
+        if request_id:
+            headers[REQUEST_ID_HEADER] = request_id
+        if span is not None:
+            headers[TRACEPARENT_HEADER] = f'00-{span.trace_id}-{span.span_id}-{"01" if span.sampled else "00"}'
+        return headers
+
+    def submit(self, executor, fn, *args, **kwargs):
+        """executor.submit() that keeps the caller's trace context in the worker thread"""
+        return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+    def record(self, span):
+        try:
+            self._buffer.put_nowait(span.to_zipkin(self.service))
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._worker is None:
+            self._start_worker()
+
+    def _start_worker(self):
+        # Started lazily so a forking server starts one per worker process
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._export_loop, name='trace-exporter', daemon=True)
+                self._worker.start()
+                atexit.register(self.flush)
+
+    def _export_loop(self):
+        while True:
+            batch = [self._buffer.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._buffer.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._export(batch)
+
+    def _export(self, batch):
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.warning(f"Exporting {len(batch)} spans failed: {str(e)}")
+
+    def flush(self):
+        """Export whatever is still buffered (called at exit)"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._buffer.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._export(batch)
+
+    def stats(self):
+        return {'exporter': type(self.exporter).__name__ if self.exporter else None,
+                'sample_rate': self.sample_rate, 'buffered': self._buffer.qsize(), 'dropped': self.dropped}
+
+
+def instrument_app(app, tracer):
+    """Accept or create a correlation ID per request and wrap each request in a server span"""
+
+    @app.before_request
+    def start_trace():
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        if not VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        g.trace_tokens = [(_request_id, _request_id.set(request_id))]
+
+        trace_id = parent_id = sampled = None
+        match = TRACEPARENT.match(request.headers.get(TRACEPARENT_HEADER, ''))
+        if match:
+            trace_id, parent_id, sampled = match.group(1), match.group(2), match.group(3) == '01'
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        span = tracer.start_span(f'{request.method} {route}', 'server', {
+            'http.method': request.method,
+            'http.route': route,
+            'http.target': request.full_path.rstrip('?'),
+            'request_id': request_id,
+        }, trace_id=trace_id, parent_id=parent_id, sampled=sampled)
+        g.trace_span = span
+        g.trace_tokens.append((_current_span, _current_span.set(span)))
+
+    @app.after_request
+    def tag_response(response):
+        request_id = _request_id.get()
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        span = g.get('trace_span')
+        if span is not None:
+            span.set('http.status_code', response.status_code)
+        return response
+
+    @app.teardown_request
+    def finish_trace(error=None):
+        span = g.pop('trace_span', None)
+        if span is not None:
+            span.finish(error=error)
+        for var, token in reversed(g.pop('trace_tokens', [])):
+            var.reset(token)
+
+
+def instrument_sqlalchemy(tracer):
+    """One span per SQL statement executed while a span is current"""
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def start_statement_span(conn, cursor, statement, parameters, context, executemany):
+        if _current_span.get() is None:
+            return
+        span = tracer.start_span(statement.split(None, 1)[0].upper() if statement else 'SQL', 'db', {
+            'db.system': conn.engine.dialect.name,
+            'db.statement': statement[:MAX_STATEMENT_LENGTH],
+        })
+        conn.info.setdefault('trace_spans', []).append(span)
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def finish_statement_span(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get('trace_spans')
+        if spans:
+            span = spans.pop()
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                span.set('db.rowcount', cursor.rowcount)
+            span.finish()
+
+    @event.listens_for(Engine, 'handle_error')
+    def fail_statement_span(exception_context):
+        connection = exception_context.connection
+        spans = connection.info.get('trace_spans') if connection is not None else None
+        if spans:
+            spans.pop().finish(error=exception_context.original_exception)
+
+
+def instrument_session(session, tracer, peer=None):
+    """Wrap a requests.Session so every call carries trace headers and, inside a trace, gets a client span"""
+    send = session.send
+
+    @wraps(send)
+    def traced_send(prepared, **kwargs):
+        if _current_span.get() is None:
+            prepared.headers.update(tracer.outbound_headers())
+            return send(prepared, **kwargs)
+        url = urlsplit(prepared.url)
+        with tracer.span(f'{prepared.method} {url.path}', 'client', **{
+            'http.method': prepared.method,
+            'http.url': prepared.url,
+            'peer.service': peer or url.netloc,
+        }) as span:
+            prepared.headers.update(tracer.outbound_headers(span))
+            response = send(prepared, **kwargs)
+            span.set('http.status_code', response.status_code)
+            return response
+
+    session.send = traced_send
+    return session
+
+
+def init_tracing(app, service):
+    """Tracer configured from the environment, hooked into the app and SQLAlchemy"""
+    tracer = Tracer(service, exporter_from_env(), sample_rate=float(os.getenv('TRACE_SAMPLE_RATE', '1.0')))
+    instrument_app(app, tracer)
+    if tracer.enabled:
+        instrument_sqlalchemy(tracer)
+    return tracer